@@ -4,19 +4,49 @@ Main Function
 
 # pylint: disable=logging-fstring-interpolation
 import logging
+from collections.abc import Iterator
 from datetime import datetime, timedelta, timezone
-from json import loads
 from os import environ
 from traceback import format_exc
 
 import azure.functions as func
 
-from .const import IOC_LIST, joe_config, DATE_FORMAT
-from .utils import (IOC_MAPPING_FUNCTION, joe_api, parse_analysis_data,
+from .const import joe_config, DATE_FORMAT
+from .utils import (iter_indicators, joe_api, parse_analysis_data, parse_json,
                     submit_indicator)
 from .state_manager import StateManager
 
 
+def collect_indicators(analysis_list: list) -> Iterator[dict]:
+    """
+    Downloads each finished analysis and yields its STIX indicators.
+
+    Parameters
+    ----------
+    analysis_list : list
+        Analyses returned by the JoeSandbox analysis list API.
+
+    Yields
+    ------
+    dict
+        STIX indicator
+    """
+    for analysis in analysis_list:
+        webid = analysis.get("webid", "")
+        _, file_data = joe_api.download_analysis(webid, "irjsonfixed")
+        if not file_data:
+            logging.warning(f"No file data returned for analysis {webid}")
+            continue
+
+        analysis_info = joe_api.get_analysis_info(webid)
+        if not analysis_info or analysis_info.get("status") != "finished":
+            logging.info(f"Analysis {webid} is not marked as finished. Skipping.")
+            continue
+
+        iocs = parse_analysis_data(parse_json(file_data)) or {}
+        yield from iter_indicators(iocs, analysis_info)
+
+
 def main(mytimer: func.TimerRequest) -> None:
     """
     Timer-triggered Azure Function to interact with the JoeSandbox API.
@@ -56,28 +86,7 @@ def main(mytimer: func.TimerRequest) -> None:
             return
 
         logging.info(f"Number of analyses returned: {len(analysis_list)}")
-        all_indicators = []
-        for analysis in analysis_list:
-            webid = analysis.get("webid", "")
-            _, file_data = joe_api.download_analysis(webid, "irjsonfixed")
-            if not file_data:
-                logging.warning(f"No file data returned for analysis {webid}")
-                continue
-
-            json_file_data = loads(file_data)
-
-            analysis_info = joe_api.get_analysis_info(webid)
-            if not analysis_info or analysis_info.get("status") != "finished":
-                logging.info(f"Analysis {webid} is not marked as finished. Skipping.")
-                continue
-
-            iocs = parse_analysis_data(json_file_data) or {}
-            for key, values in iocs.items():
-                if key in IOC_LIST and key in IOC_MAPPING_FUNCTION:
-                    indicators = IOC_MAPPING_FUNCTION[key](values, analysis_info)
-                    all_indicators.extend(indicators)
-
-        submit_indicator(all_indicators)
+        submit_indicator(collect_indicators(analysis_list))
         state.post(current_time)
 
     except Exception as ex:
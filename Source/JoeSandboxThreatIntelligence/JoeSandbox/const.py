@@ -53,9 +53,13 @@ class APIConfig:
     URL: str
     RESOURCE_APPLICATION_ID_URI: str = "https://management.azure.com"
     USER_AGENT: str = "MSSentinelJoeSandboxIntelligenceSentinel:1.0.0"
-    SLEEP: int = 60
+    SLEEP: int = 5
+    MAX_SLEEP: int = 30
     TIMEOUT: int = 300
     MAX_TI_INDICATORS_PER_REQUEST: int = 100
+    MAX_REQUEST_BYTES: int = 1024 * 1024
+    MAX_CONCURRENT_REQUESTS: int = 4
+    TOKEN_EXPIRY_MARGIN: int = 60
 
 
 SENTINEL_API = APIConfig(
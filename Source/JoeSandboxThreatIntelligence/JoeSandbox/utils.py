@@ -4,93 +4,156 @@ Core Logic of Function App
 
 # pylint: disable=logging-fstring-interpolation
 import logging
+from collections.abc import Iterable, Iterator
+from concurrent.futures import (FIRST_COMPLETED, ThreadPoolExecutor,
+                                as_completed, wait)
 from datetime import datetime, timedelta, timezone
-from ipaddress import IPv4Address, IPv6Address, ip_address
-from json import loads
-from time import sleep
+from functools import lru_cache
+from ipaddress import ip_address
+from random import uniform
+from threading import Lock
+from time import sleep, time
 from uuid import NAMESPACE_DNS, uuid5
 
 from requests import ConnectionError as ReqConnErr
-from requests import HTTPError, RequestException, Response, post
+from requests import HTTPError, RequestException, Response, Session
 
-from .const import (CONFIDENCE, HASH_TYPE_LIST, RETRY_STATUS_CODE,
+from .const import (CONFIDENCE, HASH_TYPE_LIST, IOC_LIST, RETRY_STATUS_CODE,
                     SENTINEL_API, UTC_DATE_FORMAT, joe_config)
 from .joesandbox import JoeSandbox
 
+try:
+    from orjson import dumps as json_dumps
+    from orjson import loads as json_loads
+except ImportError:
+    from json import dumps
+    from json import loads as json_loads
+
+    def json_dumps(obj) -> bytes:
+        """
+        Serialize obj to compact JSON bytes, mirroring orjson.dumps.
+        """
+        return dumps(obj, separators=(",", ":")).encode()
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+JSON_OBJECT_TYPES = (dict, simdjson.Object) if simdjson else (dict,)
+JSON_ARRAY_TYPES = (list, simdjson.Array) if simdjson else (list,)
+
 joe_api = JoeSandbox(logging)
+SESSION = Session()
+ACCESS_TOKEN_CACHE = {"access_token": "", "expires_at": 0.0}
+ACCESS_TOKEN_LOCK = Lock()
+VALID_UNTIL_DAYS = int(joe_config.VALID_UNTIL)
+_JOE_NAMESPACE = uuid5(NAMESPACE_DNS, "JoeSandbox")
+_NAMESPACE_CACHE = {"JoeSandbox": _JOE_NAMESPACE}
+TRUE_STRINGS = frozenset({"true", "1", "yes", "y", "t"})
+FALSE_STRINGS = frozenset({"false", "0", "no", "n", "f", ""})
+IP_VERSION_TYPE = {4: "ipv4-addr", 6: "ipv6-addr"}
+PLURAL_TO_SINGULAR = {"ips": "ip", "domains": "domain", "urls": "url"}
+PAYLOAD_PREFIX = b'{"sourcesystem":"JoeSandboxThreatIntelligence","stixobjects":['
+PAYLOAD_SUFFIX = b"]}"
+PAYLOAD_OVERHEAD = len(PAYLOAD_PREFIX) + len(PAYLOAD_SUFFIX)
+PATTERN_SUFFIX = "']"
+DOMAIN_PATTERN_PREFIX = "[domain-name:value = '"
+URL_PATTERN_PREFIX = "[url:value = '"
+IP_PATTERN_PREFIX = {
+    ip_type: f"[{ip_type}:value = '" for ip_type in IP_VERSION_TYPE.values()
+}
+FILE_PATTERN_PREFIX = {
+    hash_type: f"[file:hashes.'{hash_type}' = '" for hash_type, _ in HASH_TYPE_LIST
+}
+
 
-def add_domain_indicators(domains: list, analysis_data: dict) -> list:
+def escape_pattern_value(value: str) -> str:
     """
-    Adds domain indicators indicator list if the verdict of the
+    Escapes backslashes and single quotes so the value can be embedded
+    in a quoted STIX pattern string.
+    """
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def add_domain_indicators(domains: list, template: dict) -> Iterator[dict]:
+    """
+    Yields domain indicators if the verdict of the
     domains matches any of the provided verdicts.
 
     Parameters
     ----------
     domains : list
         List of domain ioc.
-    analysis_data: dict
-        analysis data
-    Returns:
-        indicators: list
-    """
-    indicators = []
-    for domain in domains:
-        if not domain.get("malicious"):
-            continue
-        try:
+    template: dict
+        Static indicator fields built by build_static_template.
+    Yields:
+        indicator: dict
+    """
+    try:
+        for domain in domains:
             domain_value = domain.get("name")
-            pattern = f"[domain-name:value = '{domain_value}']"
+            if not domain.get("malicious") or not domain_value:
+                continue
+
+            pattern = (
+                DOMAIN_PATTERN_PREFIX
+                + escape_pattern_value(domain_value)
+                + PATTERN_SUFFIX
+            )
             unique_id = generate_unique_id("domain", domain_value)
 
             indicator_data = get_static_data(
-                unique_id, analysis_data, pattern, domain_value, "domain"
+                unique_id, template, pattern, domain_value, "domain"
             )
-            indicators.append(indicator_data)
-        except Exception as err:
-            logging.error(f"Error processing domain indicators: {err}")
-    return indicators
+            yield indicator_data
+    except Exception as err:
+        logging.error(f"Error processing domain indicators: {err}")
 
 
-def add_file_indicators(files: list, analysis_data: dict) -> list:
+def add_file_indicators(files: list, template: dict) -> Iterator[dict]:
     """
-    Processes files and adds hash-based indicators to a indicator list based on verdicts.
+    Processes files and yields hash-based indicators based on verdicts.
 
     Parameters
     ----------
     files : list
         List of file ioc.
-    analysis_data : dict
-        Analysis data
+    template : dict
+        Static indicator fields built by build_static_template.
 
-    Returns
+    Yields
     ----------
-    indicators: list
-        List of IOCs
+    indicator: dict
+        STIX indicator
 
     """
-    indicators = []
-    for file in files:
-        if not file.get("malicious"):
-            continue
-        try:
+    try:
+        for file in files:
+            if not file.get("malicious"):
+                continue
+
             filename = file.get("name", "")
             for hash_type, key in HASH_TYPE_LIST:
                 hash_value = file.get(key)
                 if not hash_value:
                     continue
 
-                pattern = f"[file:hashes.'{hash_type}' = '{hash_value}']"
+                pattern = (
+                    FILE_PATTERN_PREFIX[hash_type]
+                    + escape_pattern_value(hash_value)
+                    + PATTERN_SUFFIX
+                )
                 unique_id = generate_unique_id("file", hash_value)
                 label = filename or hash_value
                 indicator_data = get_static_data(
-                    unique_id, analysis_data, pattern, label, "file"
+                    unique_id, template, pattern, label, "file"
                 )
 
-                indicators.append(indicator_data)
+                yield indicator_data
 
-        except Exception as err:
-            logging.error(f"Error processing file indicators: {err}")
-    return indicators
+    except Exception as err:
+        logging.error(f"Error processing file indicators: {err}")
 
 
 def check_ip(ip: str) -> str | None:
@@ -110,97 +173,135 @@ def check_ip(ip: str) -> str | None:
         None if not a valid IP.
     """
     try:
-        parsed_ip = ip_address(ip)
-        if isinstance(parsed_ip, IPv4Address):
-            return "ipv4-addr"
-        if isinstance(parsed_ip, IPv6Address):
-            return "ipv6-addr"
+        return IP_VERSION_TYPE.get(ip_address(ip).version)
     except ValueError:
         return None
 
 
-
 def str_to_bool(value: str) -> bool:
     """
     Convert string to bool type
     """
-    return loads(value.strip().lower()) if isinstance(value, str) else bool(value)
+    if isinstance(value, bool):
+        return value
+    if not isinstance(value, str):
+        return bool(value)
+    value = value.strip().lower()
+    if value in TRUE_STRINGS:
+        return True
+    if value in FALSE_STRINGS:
+        return False
+    return bool(value)
 
 
-def add_ip_indicators(ips: list, analysis_data: dict) -> list:
+def add_ip_indicators(ips: list, template: dict) -> Iterator[dict]:
     """
-    Adds IP indicators to the indicator list based on verdict filtering.
+    Yields IP indicators based on verdict filtering.
 
     Parameters
     ----------
     ips : list
         List of IP.
-    analysis_data : dict
-        Analysis data
+    template : dict
+        Static indicator fields built by build_static_template.
 
-    Returns
+    Yields
     ----------
-    indicators: list
-        List of IOCs
+    indicator: dict
+        STIX indicator
     """
-    indicators = []
-    for ip_entry in ips:
-        if not str_to_bool(ip_entry.get("@malicious")):
-            continue
-        try:
+    try:
+        for ip_entry in ips:
+            malicious = ip_entry.get("@malicious")
+            if malicious == "false" or not (
+                malicious == "true" or str_to_bool(malicious)
+            ):
+                continue
+
             ip_add = ip_entry.get("$", "")
             ip_type = check_ip(ip_add)
             if not ip_type:
                 logging.warning(f"Unrecognized IP type for address: {ip_add}")
                 continue
 
-            pattern = f"[{ip_type}:value = '{ip_add}']"
+            pattern = (
+                IP_PATTERN_PREFIX[ip_type] + escape_pattern_value(ip_add) + PATTERN_SUFFIX
+            )
             unique_id = generate_unique_id("ip", ip_add)
 
             indicator_data = get_static_data(
-                unique_id, analysis_data, pattern, ip_add, ip_type
+                unique_id, template, pattern, ip_add, ip_type
             )
-            indicators.append(indicator_data)
+            yield indicator_data
 
-        except Exception as err:
-            logging.error(f"Error processing IP indicators: {err}")
-    return indicators
+    except Exception as err:
+        logging.error(f"Error processing IP indicators: {err}")
 
 
-def add_url_indicators(urls: list, analysis_data: dict) -> list:
+def add_url_indicators(urls: list, template: dict) -> Iterator[dict]:
     """
-    Adds URL indicators to the global indicator list (INDICATOR_LIST) based on verdict filtering.
+    Yields URL indicators based on verdict filtering.
 
     Parameters
     ----------
     urls : list
         List of URL.
-    analysis_data : dict
-        Analysis data
+    template : dict
+        Static indicator fields built by build_static_template.
 
-    Returns
+    Yields
     ----------
-    indicators: list
-        List of IOCs
+    indicator: dict
+        STIX indicator
     """
-    indicators = []
-    for url_entry in urls:
-        if not url_entry.get("malicious"):
-            continue
-        try:
+    try:
+        for url_entry in urls:
+            url_value = url_entry.get("name")
+            if not url_entry.get("malicious") or not url_value:
+                continue
 
-            url_value = url_entry.get("name", "")
-            pattern = f"[url:value = '{url_value}']"
+            pattern = (
+                URL_PATTERN_PREFIX + escape_pattern_value(url_value) + PATTERN_SUFFIX
+            )
             unique_id = generate_unique_id("url", url_value)
             indicator_data = get_static_data(
-                unique_id, analysis_data, pattern, url_value, "url"
+                unique_id, template, pattern, url_value, "url"
             )
 
-            indicators.append(indicator_data)
+            yield indicator_data
+
+    except Exception as err:
+        logging.error(f"Error processing URL indicators: {err}")
 
-        except Exception as err:
-            logging.error(f"Error processing URL indicators: {err}")
-    return indicators
+
+def parse_json(data: bytes):
+    """
+    Parses a JSON document, lazily through simdjson when it is installed.
+
+    Parameters
+    ----------
+    data : bytes
+        Raw JSON document.
+
+    Returns
+    -------
+    dict or simdjson.Object
+        The parsed document. simdjson proxies only decode the parts that
+        are accessed.
+    """
+    if simdjson is None:
+        return json_loads(data)
+    return simdjson.Parser().parse(data)
+
+
+def to_list(value):
+    """
+    Materializes a simdjson array proxy into a Python list; other values
+    are returned unchanged.
+    """
+    if simdjson is not None and isinstance(value, simdjson.Array):
+        return value.as_list()
+    return value
 
 
 def parse_analysis_data(analysis_data: dict) -> dict:
@@ -210,7 +311,8 @@ def parse_analysis_data(analysis_data: dict) -> dict:
     Parameters
     ----------
     analysis_data : dict
-        The full analysis JSON response from JoeSandbox (IRJSON format).
+        The full analysis JSON response from JoeSandbox (IRJSON format),
+        either as a dict or as a lazy simdjson.Object from parse_json.
 
     Returns
     -------
@@ -223,25 +325,29 @@ def parse_analysis_data(analysis_data: dict) -> dict:
     contacted = analysis.get("contacted", {})
     dropped = analysis.get("dropped", {})
 
-    if isinstance(dropped, dict):
-        ioc_dict["files"] = dropped.get("file", [])
+    if isinstance(dropped, JSON_OBJECT_TYPES):
+        ioc_dict["files"] = to_list(dropped.get("file", []))
 
-    if isinstance(contacted, dict):
-        for key, value in contacted.items():
-            if isinstance(value, dict):
-                singular_key = key.rstrip("s")
-                ioc_dict[key] = value.get(singular_key, [])
-            elif isinstance(value, list):
-                ioc_dict[key] = value
+    if isinstance(contacted, JSON_OBJECT_TYPES):
+        for key in contacted.keys():
+            if key not in IOC_LIST:
+                continue
+            value = contacted[key]
+            if isinstance(value, JSON_OBJECT_TYPES):
+                ioc_dict[key] = to_list(value.get(PLURAL_TO_SINGULAR[key], []))
+            elif isinstance(value, JSON_ARRAY_TYPES):
+                ioc_dict[key] = to_list(value)
 
     return ioc_dict
 
 
+@lru_cache(maxsize=65536)
 def generate_unique_id(
     indicator_type: str, indicator_value: str, threat_source: str = "JoeSandbox"
 ) -> str:
     """
     Generates a unique identifier string for a threat indicator.
+    Results are cached, so repeated IOC values skip the uuid5 hashing.
 
     Parameters
     ----------
@@ -257,23 +363,33 @@ def generate_unique_id(
     str
         Unique indicator id.
     """
-    custom_namespace = uuid5(NAMESPACE_DNS, threat_source)
+    custom_namespace = _NAMESPACE_CACHE.get(threat_source)
+    if custom_namespace is None:
+        custom_namespace = _NAMESPACE_CACHE.setdefault(
+            threat_source, uuid5(NAMESPACE_DNS, threat_source)
+        )
     name_string = f"{indicator_type}:{indicator_value}"
     indicator_uuid = uuid5(custom_namespace, name_string)
     return f"indicator--{indicator_uuid}"
 
 
-def get_utc_time() -> str:
+def get_utc_time(current_time: datetime | None = None) -> str:
     """
-    Returns the current UTC time formatted as an ISO 8601 timestamp.
+    Returns the given (or current) UTC time formatted as an ISO 8601 timestamp.
+
+    Parameters
+    ----------
+    current_time : datetime, optional
+        Timezone-aware UTC time to format. Defaults to now.
 
     Returns
     -------
     str
-        The current UTC time as an ISO 8601 timestamp with milliseconds,
+        The UTC time as an ISO 8601 timestamp with milliseconds,
         e.g., '2025-06-26T14:03:12.123Z'.
     """
-    current_time = datetime.now(timezone.utc)
+    if current_time is None:
+        current_time = datetime.now(timezone.utc)
     formatted_time = (
         current_time.strftime(UTC_DATE_FORMAT)
         + f".{current_time.microsecond // 1000:03d}Z"
@@ -281,9 +397,74 @@ def get_utc_time() -> str:
     return formatted_time
 
 
+@lru_cache(maxsize=4)
+def get_expiration_date(epoch_minute: int) -> str:
+    """
+    Returns the indicator expiration timestamp for the given minute.
+
+    Parameters
+    ----------
+    epoch_minute : int
+        Minutes since the Unix epoch; quantizing to the minute lets
+        analyses processed in the same minute share a cached result.
+
+    Returns
+    -------
+    str
+        UTC timestamp VALID_UNTIL_DAYS after epoch_minute,
+        e.g., '2025-07-26T14:03:00Z'.
+    """
+    expiration = datetime.fromtimestamp(epoch_minute * 60, timezone.utc) + timedelta(
+        days=VALID_UNTIL_DAYS
+    )
+    return expiration.strftime(f"{UTC_DATE_FORMAT}Z")
+
+
+def build_static_template(analysis_data: dict) -> dict:
+    """
+    Builds the indicator fields shared by every IOC of a single analysis.
+
+    Parameters
+    ----------
+    analysis_data : dict
+        analysis metadata.
+
+    Returns
+    -------
+    dict
+        A dictionary holding the analysis-wide part of a threat indicator.
+    """
+    web_id = analysis_data.get("webid")
+    detection = analysis_data.get("detection", "")
+    tags = [
+        f"web_id: {web_id}",
+        f"threat_names: {analysis_data.get('threatname', '')}",
+        f"classification: {analysis_data.get('classification', '')}",
+        f"detection: {detection}",
+    ]
+    now = datetime.now(timezone.utc)
+    current_time = get_utc_time(now)
+    expiration_date = get_expiration_date(int(now.timestamp()) // 60)
+
+    return {
+        "type": "indicator",
+        "spec_version": "2.1",
+        "created": current_time,
+        "modified": current_time,
+        "revoked": False,
+        "labels": tags,
+        "confidence": CONFIDENCE.get(detection, 0),
+        "description": f"Analysis URL: {joe_config.BASE_URL}/analysis/{web_id}",
+        "pattern_type": "stix",
+        "pattern_version": "2.1",
+        "valid_from": current_time,
+        "valid_until": expiration_date,
+    }
+
+
 def get_static_data(
         unique_uuid: str,
-        analysis_data: dict,
+        template: dict,
         pattern: str,
         ioc_value: str,
         ioc_type:str
@@ -295,8 +476,8 @@ def get_static_data(
     ----------
     unique_uuid : str
         A globally unique identifier for the indicator.
-    analysis_data : dict
-        analysis metadata.
+    template : dict
+        Static indicator fields built by build_static_template.
     pattern : str
         A STIX pattern string.
     ioc_value : str
@@ -308,36 +489,13 @@ def get_static_data(
     dict
         A dictionary representing the structured threat indicator
     """
-    web_id = analysis_data.get("webid")
-    tags = [
-        f"web_id: {web_id}",
-        f"threat_names: {analysis_data.get('threatname', '')}",
-        f"classification: {analysis_data.get('classification', '')}",
-        f"detection: {analysis_data.get('detection', '')}",
-    ]
-    expiration_date = (
-        datetime.now(timezone.utc) + timedelta(days=int(joe_config.VALID_UNTIL))
-    ).strftime(f"{UTC_DATE_FORMAT}Z")
-
-    data = {
-        "type": "indicator",
-        "spec_version": "2.1",
+    return {
+        **template,
         "id": unique_uuid,
-        "created": get_utc_time(),
-        "modified": get_utc_time(),
-        "revoked": False,
-        "labels": tags,
-        "confidence": CONFIDENCE.get(analysis_data.get("detection", ""), 0),
         "name": ioc_value,
-        "description": f"Analysis URL: {joe_config.BASE_URL}/analysis/{web_id}",
         "indicator_types": [ioc_type],
         "pattern": pattern,
-        "pattern_type": "stix",
-        "pattern_version": "2.1",
-        "valid_from": get_utc_time(),
-        "valid_until": expiration_date,
     }
-    return data
 
 
 IOC_MAPPING_FUNCTION = {
@@ -348,14 +506,176 @@ IOC_MAPPING_FUNCTION = {
 }
 
 
-def create_indicator(indicator_data: list, retry: int = 3) -> Response:
+def iter_indicators(iocs: dict, analysis_data: dict) -> Iterator[dict]:
+    """
+    Yields the STIX indicators of a single analysis.
+
+    Parameters
+    ----------
+    iocs : dict
+        Categorized IOCs as returned by parse_analysis_data.
+    analysis_data : dict
+        analysis metadata.
+
+    Yields
+    ------
+    dict
+        STIX indicator
+    """
+    template = build_static_template(analysis_data)
+    for key, values in iocs.items():
+        add_indicators = IOC_MAPPING_FUNCTION.get(key)
+        if add_indicators is not None:
+            yield from add_indicators(values, template)
+
+
+def dedupe_indicators(indicators: Iterable[dict]) -> Iterator[dict]:
+    """
+    Drops indicators whose id has already been seen.
+
+    Duplicates from different analyses differ in their timestamps, labels,
+    description and confidence. The first one wins, so an IOC keeps the
+    metadata of the earliest analysis in the stream. get_analysis_list
+    returns analyses in JoeAnalysisVerdict order (by default malicious
+    before suspicious), so the higher-confidence analysis is kept.
+
+    Parameters
+    ----------
+    indicators : Iterable[dict]
+        STIX indicators.
+
+    Yields
+    ------
+    dict
+        The first indicator for every distinct id.
+    """
+    seen_ids = set()
+    for indicator in indicators:
+        indicator_id = indicator["id"]
+        if indicator_id in seen_ids:
+            continue
+        seen_ids.add(indicator_id)
+        yield indicator
+
+
+def iter_payloads(
+    indicators: Iterable[dict], max_items: int, max_bytes: int
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Serializes indicators one by one into Sentinel upload request bodies.
+
+    Parameters
+    ----------
+    indicators : Iterable[dict]
+        STIX indicators.
+    max_items : int
+        Maximum number of indicators per request body.
+    max_bytes : int
+        Approximate maximum size of a request body in bytes.
+
+    Yields
+    ------
+    tuple[int, bytes]
+        The number of indicators and the serialized request body.
+    """
+    buffer = bytearray()
+    count = 0
+    for indicator in indicators:
+        encoded = json_dumps(indicator)
+        if count and (
+            count == max_items
+            or PAYLOAD_OVERHEAD + len(buffer) + len(encoded) + 1 > max_bytes
+        ):
+            yield count, PAYLOAD_PREFIX + buffer + PAYLOAD_SUFFIX
+            buffer = bytearray()
+            count = 0
+        if count:
+            buffer += b","
+        buffer += encoded
+        count += 1
+    if count:
+        yield count, PAYLOAD_PREFIX + buffer + PAYLOAD_SUFFIX
+
+
+def get_access_token() -> str:
+    """
+    Returns an Azure access token, requesting a new one only when the
+    cached token is missing or about to expire.
+
+    Returns
+    -------
+    str
+        The bearer token for the Sentinel API.
+    """
+    with ACCESS_TOKEN_LOCK:
+        if time() < ACCESS_TOKEN_CACHE["expires_at"] - SENTINEL_API.TOKEN_EXPIRY_MARGIN:
+            return ACCESS_TOKEN_CACHE["access_token"]
+
+        azure_login_payload = {
+            "grant_type": "client_credentials",
+            "client_id": SENTINEL_API.APPLICATION_ID,
+            "client_secret": SENTINEL_API.APPLICATION_SECRET,
+            "resource": SENTINEL_API.RESOURCE_APPLICATION_ID_URI,
+        }
+        response = SESSION.post(
+            url=SENTINEL_API.AUTH_URL,
+            data=azure_login_payload,
+            timeout=SENTINEL_API.TIMEOUT,
+        )
+        response.raise_for_status()
+        token_data = json_loads(response.content)
+        ACCESS_TOKEN_CACHE["access_token"] = token_data.get("access_token")
+        ACCESS_TOKEN_CACHE["expires_at"] = time() + int(token_data.get("expires_in", 0))
+        return ACCESS_TOKEN_CACHE["access_token"]
+
+
+def invalidate_access_token(access_token: str) -> None:
+    """
+    Expires the cached Azure access token if it is still the rejected one,
+    so a token another worker has just refreshed is kept.
+
+    Parameters
+    ----------
+    access_token : str
+        The token the Sentinel API rejected.
+    """
+    with ACCESS_TOKEN_LOCK:
+        if ACCESS_TOKEN_CACHE["access_token"] == access_token:
+            ACCESS_TOKEN_CACHE["expires_at"] = 0.0
+
+
+def get_retry_delay(attempt: int, retry_after: str | None = None) -> float:
+    """
+    Returns the number of seconds to wait before the given retry attempt.
+
+    Parameters
+    ----------
+    attempt : int
+        Retry attempt, starting at 1.
+    retry_after : str, optional
+        Value of the Retry-After response header, honored when it is a
+        number of seconds.
+
+    Returns
+    -------
+    float
+        The Retry-After value or exponential backoff with jitter, both
+        capped at SENTINEL_API.MAX_SLEEP.
+    """
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), SENTINEL_API.MAX_SLEEP)
+    base = SENTINEL_API.SLEEP
+    return min(base * 2 ** (attempt - 1) + uniform(0, base), SENTINEL_API.MAX_SLEEP)
+
+
+def create_indicator(payload: bytes, retry: int = 3) -> Response:
     """
     Creates a threat intelligence indicator in the Sentinel system.
 
     Parameters
     ----------
-    indicator_data : list
-        The STIX-formatted threat intelligence data to be submitted.
+    payload : bytes
+        The serialized upload request body built by iter_payloads.
     retry: int
         Number of retry.
 
@@ -372,58 +692,53 @@ def create_indicator(indicator_data: list, retry: int = 3) -> Response:
     Exception
         Raised for any other unexpected errors during indicator creation.
     """
-    retry_count_429 = 0
-    retry_connection = 0
-    indicator = {
-        "sourcesystem": "JoeSandboxThreatIntelligence",
-        "stixobjects": indicator_data,
-    }
+    attempt = 0
+    token_refreshed = False
 
-    azure_login_payload = {
-        "grant_type": "client_credentials",
-        "client_id": SENTINEL_API.APPLICATION_ID,
-        "client_secret": SENTINEL_API.APPLICATION_SECRET,
-        "resource": SENTINEL_API.RESOURCE_APPLICATION_ID_URI,
-    }
-
-    while retry_count_429 <= retry:
+    while True:
         try:
-            response = post(
-                url=SENTINEL_API.AUTH_URL,
-                data=azure_login_payload,
-                timeout=SENTINEL_API.TIMEOUT,
-            )
-            response.raise_for_status()
-            access_token = response.json().get("access_token")
+            access_token = ""
+            access_token = get_access_token()
             headers = {
                 "Authorization": f"Bearer {access_token}",
                 "User-Agent": SENTINEL_API.USER_AGENT,
                 "Content-Type": "application/json",
             }
-            response = post(
+            response = SESSION.post(
                 SENTINEL_API.URL,
                 headers=headers,
-                json=indicator,
+                data=payload,
                 timeout=SENTINEL_API.TIMEOUT,
             )
             response.raise_for_status()
             return response
         except HTTPError as herr:
             err_response = {}
-            if herr.response:
+            status_code = None
+            if herr.response is not None:
+                status_code = herr.response.status_code
                 try:
-                    err_response = herr.response.json()
+                    err_response = json_loads(herr.response.content)
                 except Exception:
                     err_response = {"message": "Failed to parse error response"}
 
-                if herr.response.status_code in RETRY_STATUS_CODE:
-                    retry_count_429 += 1
-                    logging.warning(
-                        f"Attempt {retry_count_429}: HTTP {herr.response.status_code}."
-                        f" Retrying after {SENTINEL_API.SLEEP}s..."
-                    )
-                    sleep(SENTINEL_API.SLEEP)
-                    continue
+            if status_code == 401 and not token_refreshed:
+                logging.warning("Access token rejected. Refreshing token...")
+                token_refreshed = True
+                invalidate_access_token(access_token)
+                continue
+
+            if status_code in RETRY_STATUS_CODE and attempt < retry:
+                attempt += 1
+                delay = get_retry_delay(
+                    attempt, herr.response.headers.get("Retry-After")
+                )
+                logging.warning(
+                    f"Attempt {attempt}: HTTP {status_code}."
+                    f" Retrying after {delay:.0f}s..."
+                )
+                sleep(delay)
+                continue
 
             logging.error(f"HTTPError from Sentinel API: {herr}")
             logging.error(f"ERROR msg: {err_response}")
@@ -432,13 +747,14 @@ def create_indicator(indicator_data: list, retry: int = 3) -> Response:
             ReqConnErr,
             RequestException,
         ) as conn_err:
-            if retry_connection < retry:
-                retry_connection += 1
+            if attempt < retry:
+                attempt += 1
+                delay = get_retry_delay(attempt)
                 logging.warning(
-                    f"Attempt {retry_connection}: Connection error."
-                    f" Retrying after {SENTINEL_API.SLEEP}s..."
+                    f"Attempt {attempt}: Connection error."
+                    f" Retrying after {delay:.0f}s..."
                 )
-                sleep(SENTINEL_API.SLEEP)
+                sleep(delay)
                 continue
             logging.error(f"Connection failed after retries: {conn_err}")
             raise Exception(conn_err) from conn_err
@@ -447,29 +763,39 @@ def create_indicator(indicator_data: list, retry: int = 3) -> Response:
             logging.error(f"Unexpected error: {err}")
             raise Exception(err) from err
 
-    raise Exception("Failed to create indicator after multiple retries.")
 
-
-def submit_indicator(indicators_list: list) -> bool:
+def submit_indicator(indicators: Iterable[dict]) -> bool:
     """
     Submit Indicator to sentinel
 
     Parameters
     ----------
-    indicators_list : list
-        list of all-indicators
+    indicators : Iterable[dict]
+        all indicators, serialized and uploaded lazily in chunks
     Returns
     -------
         bool
     """
     try:
-        logging.info(f"length of indicator {len(indicators_list)}")
-        for i in range(
-            0, len(indicators_list), SENTINEL_API.MAX_TI_INDICATORS_PER_REQUEST
-        ):
-            create_indicator(
-                indicators_list[i : i + SENTINEL_API.MAX_TI_INDICATORS_PER_REQUEST]
-            )
+        total = 0
+        pending = set()
+        with ThreadPoolExecutor(
+            max_workers=SENTINEL_API.MAX_CONCURRENT_REQUESTS
+        ) as executor:
+            for count, payload in iter_payloads(
+                dedupe_indicators(indicators),
+                SENTINEL_API.MAX_TI_INDICATORS_PER_REQUEST,
+                SENTINEL_API.MAX_REQUEST_BYTES,
+            ):
+                if len(pending) >= SENTINEL_API.MAX_CONCURRENT_REQUESTS:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(create_indicator, payload))
+                total += count
+            for future in as_completed(pending):
+                future.result()
+        logging.info(f"length of indicator {total}")
         return True
     except Exception as err:
         logging.info(f"Error occurred during IOC creation: {err}")